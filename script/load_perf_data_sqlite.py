@@ -1,5 +1,6 @@
 from __future__ import print_function
 
+import os
 import sys
 import struct
 import sqlite3
@@ -99,21 +100,22 @@ def do_query_(cursor, query, params=()):
 
 printdate("Creating database ...")
 
-db_exists = False
-try:
-    f = open(dbname)
-    f.close()
-    db_exists = True
-except Exception as e:
-    pass
-
-if db_exists:
+if os.path.exists(dbname):
     raise Exception(dbname + " already exists")
 
-conn = sqlite3.connect(dbname)
+# Transactions are managed explicitly with BEGIN/END below. In the default
+# mode sqlite3 would also open implicit ones, e.g. around the has_calls
+# UPDATE in trace_end, which were then never committed.
+conn = sqlite3.connect(dbname, isolation_level=None)
 cursor = conn.cursor()
 
+# The database is rebuilt from the perf data whenever it is lost, so trade
+# durability for load speed: no journal, no fsync, and a 64 MiB page cache so
+# the whole load stays in the single transaction opened by trace_begin.
 do_query(cursor, "PRAGMA journal_mode = OFF")
+do_query(cursor, "PRAGMA synchronous = OFF")
+do_query(cursor, "PRAGMA temp_store = MEMORY")
+do_query(cursor, "PRAGMA cache_size = -65536")
 do_query(cursor, "BEGIN TRANSACTION")
 
 do_query(
@@ -329,12 +331,7 @@ do_query(
 )
 
 # printf was added to sqlite in version 3.8.3
-sqlite_has_printf = False
-try:
-    do_query(cursor, 'SELECT printf("") FROM machines')
-    sqlite_has_printf = True
-except sqlite3.Error:
-    pass
+sqlite_has_printf = sqlite3.sqlite_version_info >= (3, 8, 3)
 
 
 def emit_to_hex(x):
@@ -372,14 +369,15 @@ do_query(
     cursor,
     "CREATE VIEW symbols_view AS "
     "SELECT "
-    "id,"
+    "symbols.id,"
     "name,"
-    "(SELECT short_name FROM dsos WHERE id=dso_id) AS dso,"
+    "dsos.short_name AS dso,"
     "dso_id,"
     "sym_start,"
     "sym_end,"
     "CASE WHEN binding=0 THEN 'local' WHEN binding=1 THEN 'global' ELSE 'weak' END AS binding"
-    " FROM symbols",
+    " FROM symbols"
+    " LEFT JOIN dsos ON dsos.id = dso_id",
 )
 
 do_query(
@@ -576,31 +574,37 @@ do_query(
     "time,"
     "cpu,"
     "selected_events.name AS event,"
-    "CASE WHEN selected_events.name='cbr' THEN (SELECT cbr FROM cbr WHERE cbr.id = samples.id) ELSE \"\" END AS cbr,"
-    "CASE WHEN selected_events.name='cbr' THEN (SELECT mhz FROM cbr WHERE cbr.id = samples.id) ELSE \"\" END AS mhz,"
-    "CASE WHEN selected_events.name='cbr' THEN (SELECT percent FROM cbr WHERE cbr.id = samples.id) ELSE \"\" END AS percent,"
-    "CASE WHEN selected_events.name='mwait' THEN (SELECT "
+    "CASE WHEN selected_events.name='cbr' THEN cbr.cbr ELSE \"\" END AS cbr,"
+    "CASE WHEN selected_events.name='cbr' THEN mhz ELSE \"\" END AS mhz,"
+    "CASE WHEN selected_events.name='cbr' THEN percent ELSE \"\" END AS percent,"
+    "CASE WHEN selected_events.name='mwait' THEN "
     + emit_to_hex("hints")
-    + ' FROM mwait WHERE mwait.id = samples.id) ELSE "" END AS hints_hex,'
-    "CASE WHEN selected_events.name='mwait' THEN (SELECT "
+    + ' ELSE "" END AS hints_hex,'
+    "CASE WHEN selected_events.name='mwait' THEN "
     + emit_to_hex("extensions")
-    + ' FROM mwait WHERE mwait.id = samples.id) ELSE "" END AS extensions_hex,'
-    "CASE WHEN selected_events.name='pwre' THEN (SELECT cstate FROM pwre WHERE pwre.id = samples.id) ELSE \"\" END AS cstate,"
-    "CASE WHEN selected_events.name='pwre' THEN (SELECT subcstate FROM pwre WHERE pwre.id = samples.id) ELSE \"\" END AS subcstate,"
-    "CASE WHEN selected_events.name='pwre' THEN (SELECT hw FROM pwre WHERE pwre.id = samples.id) ELSE \"\" END AS hw,"
-    "CASE WHEN selected_events.name='exstop' THEN (SELECT exact_ip FROM exstop WHERE exstop.id = samples.id) ELSE \"\" END AS exact_ip,"
-    "CASE WHEN selected_events.name='pwrx' THEN (SELECT deepest_cstate FROM pwrx WHERE pwrx.id = samples.id) ELSE \"\" END AS deepest_cstate,"
-    "CASE WHEN selected_events.name='pwrx' THEN (SELECT last_cstate FROM pwrx WHERE pwrx.id = samples.id) ELSE \"\" END AS last_cstate,"
-    "CASE WHEN selected_events.name='pwrx' THEN (SELECT "
+    + ' ELSE "" END AS extensions_hex,'
+    "CASE WHEN selected_events.name='pwre' THEN cstate ELSE \"\" END AS cstate,"
+    "CASE WHEN selected_events.name='pwre' THEN subcstate ELSE \"\" END AS subcstate,"
+    "CASE WHEN selected_events.name='pwre' THEN hw ELSE \"\" END AS hw,"
+    "CASE WHEN selected_events.name='exstop' THEN exact_ip ELSE \"\" END AS exact_ip,"
+    "CASE WHEN selected_events.name='pwrx' THEN deepest_cstate ELSE \"\" END AS deepest_cstate,"
+    "CASE WHEN selected_events.name='pwrx' THEN last_cstate ELSE \"\" END AS last_cstate,"
+    "CASE WHEN selected_events.name='pwrx' THEN "
     "CASE     WHEN wake_reason=1 THEN 'Interrupt'"
     " WHEN wake_reason=2 THEN 'Timer Deadline'"
     " WHEN wake_reason=4 THEN 'Monitored Address'"
     " WHEN wake_reason=8 THEN 'HW'"
     " ELSE wake_reason "
     "END"
-    ' FROM pwrx WHERE pwrx.id = samples.id) ELSE "" END AS wake_reason'
+    ' ELSE "" END AS wake_reason'
     " FROM samples"
     " INNER JOIN selected_events ON selected_events.id = evsel_id"
+    # one join per power event table instead of a subquery per column and row
+    " LEFT JOIN cbr ON cbr.id = samples.id"
+    " LEFT JOIN mwait ON mwait.id = samples.id"
+    " LEFT JOIN pwre ON pwre.id = samples.id"
+    " LEFT JOIN exstop ON exstop.id = samples.id"
+    " LEFT JOIN pwrx ON pwrx.id = samples.id"
     " WHERE selected_events.name IN ('cbr','mwait','exstop','pwre','pwrx')",
 )
 
@@ -631,66 +635,81 @@ do_query(
 )
 
 do_query(cursor, "END TRANSACTION")
-conn.commit()
 
 
 printdate("Database setup completed.")
 
 
+# Insert statements, shared by trace_begin and the perf callbacks
+INSERT_SELECTED_EVENTS = "INSERT INTO selected_events VALUES (?, ?)"
+INSERT_MACHINES = "INSERT INTO machines VALUES (?, ?, ?)"
+INSERT_THREADS = "INSERT INTO threads VALUES (?, ?, ?, ?, ?)"
+INSERT_COMMS = "INSERT INTO comms VALUES (?, ?, ?, ?, ?)"
+INSERT_COMM_THREADS = "INSERT INTO comm_threads VALUES (?, ?, ?)"
+INSERT_DSOS = "INSERT INTO dsos VALUES (?, ?, ?, ?, ?)"
+INSERT_SYMBOLS = "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)"
+INSERT_BRANCH_TYPES = "INSERT INTO branch_types VALUES (?, ?)"
+INSERT_CALL_PATHS = "INSERT INTO call_paths VALUES (?, ?, ?, ?)"
+INSERT_CALLS = "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_PTWRITE = "INSERT INTO ptwrite VALUES (?, ?, ?)"
+INSERT_CBR = "INSERT INTO cbr VALUES (?, ?, ?, ?)"
+INSERT_MWAIT = "INSERT INTO mwait VALUES (?, ?, ?)"
+INSERT_PWRE = "INSERT INTO pwre VALUES (?, ?, ?, ?)"
+INSERT_EXSTOP = "INSERT INTO exstop VALUES (?, ?)"
+INSERT_PWRX = "INSERT INTO pwrx VALUES (?, ?, ?, ?)"
+INSERT_CONTEXT_SWITCHES = (
+    "INSERT INTO context_switches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+if branches:
+    INSERT_SAMPLES = "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+else:
+    INSERT_SAMPLES = "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
 # 插入数据函数
 def insert_selected_events(cursor, values):
-    cursor.execute("INSERT INTO selected_events VALUES (?, ?)", values)
+    cursor.execute(INSERT_SELECTED_EVENTS, values)
 
 
 def insert_machines(cursor, values):
-    cursor.execute("INSERT INTO machines VALUES (?, ?, ?)", values)
+    cursor.execute(INSERT_MACHINES, values)
 
 
 def insert_threads(cursor, values):
-    cursor.execute("INSERT INTO threads VALUES (?, ?, ?, ?, ?)", values)
+    cursor.execute(INSERT_THREADS, values)
 
 
 def insert_comms(cursor, values):
-    cursor.execute("INSERT INTO comms VALUES (?, ?, ?, ?, ?)", values)
+    cursor.execute(INSERT_COMMS, values)
 
 
 def insert_comm_threads(cursor, values):
-    cursor.execute("INSERT INTO comm_threads VALUES (?, ?, ?)", values)
+    cursor.execute(INSERT_COMM_THREADS, values)
 
 
 def insert_dsos(cursor, values):
-    cursor.execute("INSERT INTO dsos VALUES (?, ?, ?, ?, ?)", values)
+    cursor.execute(INSERT_DSOS, values)
 
 
 def insert_symbols(cursor, values):
-    cursor.execute("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)", values)
+    cursor.execute(INSERT_SYMBOLS, values)
 
 
 def insert_branch_types(cursor, values):
-    cursor.execute("INSERT INTO branch_types VALUES (?, ?)", values)
+    cursor.execute(INSERT_BRANCH_TYPES, values)
 
 
 def insert_samples(cursor, values):
-    if branches:
-        cursor.execute(
-            "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            values,
-        )
-    else:
-        cursor.execute(
-            "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            values,
-        )
+    cursor.execute(INSERT_SAMPLES, values)
 
 
 def insert_call_paths(cursor, values):
-    cursor.execute("INSERT INTO call_paths VALUES (?, ?, ?, ?)", values)
+    cursor.execute(INSERT_CALL_PATHS, values)
 
 
 def insert_calls(cursor, values):
-    cursor.execute(
-        "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values
-    )
+    cursor.execute(INSERT_CALLS, values)
 
 
 def trace_begin():
@@ -724,8 +743,8 @@ unhandled_count = 0
 
 
 def trace_end():
+    flush_rows(cursor)
     do_query(cursor, "END TRANSACTION")
-    conn.commit()
 
     printdate("Adding indexes")
     if perf_db_export_calls:
@@ -734,26 +753,25 @@ def trace_end():
         do_query(cursor, "ALTER TABLE comms ADD COLUMN has_calls boolean")
         do_query(
             cursor,
-            "UPDATE comms SET has_calls = 1 WHERE comms.id IN (SELECT DISTINCT comm_id FROM calls)",
+            # IN already builds a set of comm_id, DISTINCT would build a second one
+            "UPDATE comms SET has_calls = 1 WHERE comms.id IN (SELECT comm_id FROM calls)",
         )
 
     printdate("Dropping unused tables")
-    if is_table_empty("ptwrite"):
+    empty = empty_tables(
+        "ptwrite", "mwait", "pwre", "exstop", "pwrx", "cbr", "context_switches"
+    )
+    if empty["ptwrite"]:
         drop("ptwrite")
-    if (
-        is_table_empty("mwait")
-        and is_table_empty("pwre")
-        and is_table_empty("exstop")
-        and is_table_empty("pwrx")
-    ):
+    if empty["mwait"] and empty["pwre"] and empty["exstop"] and empty["pwrx"]:
         do_query(cursor, "DROP VIEW power_events_view")
         drop("mwait")
         drop("pwre")
         drop("exstop")
         drop("pwrx")
-        if is_table_empty("cbr"):
+        if empty["cbr"]:
             drop("cbr")
-    if is_table_empty("context_switches"):
+    if empty["context_switches"]:
         drop("context_switches")
 
     if unhandled_count:
@@ -761,11 +779,13 @@ def trace_end():
     printdate("Done")
 
 
-def is_table_empty(table_name):
-    do_query(cursor, f"SELECT * FROM {table_name} LIMIT 1")
-    if cursor.fetchone():
-        return False
-    return True
+def empty_tables(*table_names):
+    # check all tables in a single query
+    do_query(
+        cursor,
+        "SELECT " + ", ".join(f"NOT EXISTS (SELECT 1 FROM {t})" for t in table_names),
+    )
+    return dict(zip(table_names, map(bool, cursor.fetchone())))
 
 
 def drop(table_name):
@@ -782,137 +802,147 @@ def sched__sched_switch(*x):
     pass
 
 
+# Rows waiting to be inserted, per insert statement
+pending_rows = {}
+BATCH_SIZE = 10000
+
+
 def bind_exec(cursor, query, values):
-    cursor.execute(query, values)
+    rows = pending_rows.setdefault(query, [])
+    rows.append(values)
+    if len(rows) >= BATCH_SIZE:
+        cursor.executemany(query, rows)
+        rows.clear()
+
+
+def flush_rows(cursor):
+    for query, rows in pending_rows.items():
+        if rows:
+            cursor.executemany(query, rows)
+            rows.clear()
 
 
 def evsel_table(*x):
-    bind_exec(cursor, "INSERT INTO selected_events VALUES (?, ?)", x)
+    bind_exec(cursor, INSERT_SELECTED_EVENTS, x)
 
 
 def machine_table(*x):
-    bind_exec(cursor, "INSERT INTO machines VALUES (?, ?, ?)", x)
+    bind_exec(cursor, INSERT_MACHINES, x)
 
 
 def thread_table(*x):
-    bind_exec(cursor, "INSERT INTO threads VALUES (?, ?, ?, ?, ?)", x)
+    bind_exec(cursor, INSERT_THREADS, x)
 
 
 def comm_table(*x):
-    bind_exec(cursor, "INSERT INTO comms VALUES (?, ?, ?, ?, ?)", x)
+    bind_exec(cursor, INSERT_COMMS, x)
 
 
 def comm_thread_table(*x):
-    bind_exec(cursor, "INSERT INTO comm_threads VALUES (?, ?, ?)", x)
+    bind_exec(cursor, INSERT_COMM_THREADS, x)
 
 
 def dso_table(*x):
-    bind_exec(cursor, "INSERT INTO dsos VALUES (?, ?, ?, ?, ?)", x)
+    bind_exec(cursor, INSERT_DSOS, x)
 
 
 def symbol_table(*x):
-    bind_exec(cursor, "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)", x)
+    bind_exec(cursor, INSERT_SYMBOLS, x)
 
 
 def branch_type_table(*x):
-    bind_exec(cursor, "INSERT INTO branch_types VALUES (?, ?)", x)
+    bind_exec(cursor, INSERT_BRANCH_TYPES, x)
 
 
-def sample_table(*x):
-    if branches:
-        values = x[:15] + x[19:25]
-        cursor.execute(
-            "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            values,
-        )
-    else:
-        cursor.execute(
-            "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            x[:25],
-        )
+# sample_table is the busiest callback, pick the variant for the columns once
+if branches:
+
+    def sample_table(*x):
+        bind_exec(cursor, INSERT_SAMPLES, x[:15] + x[19:25])
+
+else:
+
+    def sample_table(*x):
+        bind_exec(cursor, INSERT_SAMPLES, x[:25])
 
 
 def call_path_table(*x):
-    bind_exec(cursor, "INSERT INTO call_paths VALUES (?, ?, ?, ?)", x)
+    bind_exec(cursor, INSERT_CALL_PATHS, x)
 
 
 def call_return_table(*x):
-    bind_exec(
-        cursor, "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", x
-    )
+    bind_exec(cursor, INSERT_CALLS, x)
+
+
+# Synthesized event payload layouts, compiled once instead of per event
+unpack_flags_payload = struct.Struct("<IQ").unpack_from
+unpack_cbr = struct.Struct("<BBBBII").unpack_from
+unpack_flags = struct.Struct("<I").unpack_from
 
 
 def ptwrite(id, raw_buf):
-    data = struct.unpack_from("<IQ", raw_buf)
+    data = unpack_flags_payload(raw_buf)
     flags = data[0]
     payload = data[1]
     exact_ip = flags & 1
     insert_values = (id, payload, exact_ip)
-    bind_exec(cursor, "INSERT INTO ptwrite VALUES (?, ?, ?)", insert_values)
+    bind_exec(cursor, INSERT_PTWRITE, insert_values)
 
 
 def cbr(id, raw_buf):
-    data = struct.unpack_from("<BBBBII", raw_buf)
+    data = unpack_cbr(raw_buf)
     cbr = data[0]
     MHz = (data[4] + 500) / 1000
     percent = ((cbr * 1000 / data[2]) + 5) / 10
     insert_values = (id, cbr, MHz, percent)
-    bind_exec(cursor, "INSERT INTO cbr VALUES (?, ?, ?, ?)", insert_values)
+    bind_exec(cursor, INSERT_CBR, insert_values)
 
 
 def mwait(id, raw_buf):
-    data = struct.unpack_from("<IQ", raw_buf)
+    data = unpack_flags_payload(raw_buf)
     payload = data[1]
     hints = payload & 0xFF
     extensions = (payload >> 32) & 0x3
     insert_values = (id, hints, extensions)
-    bind_exec(cursor, "INSERT INTO mwait VALUES (?, ?, ?)", insert_values)
+    bind_exec(cursor, INSERT_MWAIT, insert_values)
 
 
 def pwre(id, raw_buf):
-    data = struct.unpack_from("<IQ", raw_buf)
+    data = unpack_flags_payload(raw_buf)
     payload = data[1]
     hw = (payload >> 7) & 1
     cstate = (payload >> 12) & 0xF
     subcstate = (payload >> 8) & 0xF
     insert_values = (id, cstate, subcstate, hw)
-    bind_exec(cursor, "INSERT INTO pwre VALUES (?, ?, ?, ?)", insert_values)
+    bind_exec(cursor, INSERT_PWRE, insert_values)
 
 
 def exstop(id, raw_buf):
-    data = struct.unpack_from("<I", raw_buf)
+    data = unpack_flags(raw_buf)
     flags = data[0]
     exact_ip = flags & 1
     insert_values = (id, exact_ip)
-    bind_exec(cursor, "INSERT INTO exstop VALUES (?, ?)", insert_values)
+    bind_exec(cursor, INSERT_EXSTOP, insert_values)
 
 
 def pwrx(id, raw_buf):
-    data = struct.unpack_from("<IQ", raw_buf)
+    data = unpack_flags_payload(raw_buf)
     payload = data[1]
     deepest_cstate = payload & 0xF
     last_cstate = (payload >> 4) & 0xF
     wake_reason = (payload >> 8) & 0xF
     insert_values = (id, deepest_cstate, last_cstate, wake_reason)
-    bind_exec(cursor, "INSERT INTO pwrx VALUES (?, ?, ?, ?)", insert_values)
+    bind_exec(cursor, INSERT_PWRX, insert_values)
+
+
+# Synthesized event handlers, indexed by the event config
+synth_handlers = (ptwrite, mwait, pwre, exstop, pwrx, cbr)
 
 
 def synth_data(id, config, raw_buf, *x):
-    if config == 0:
-        ptwrite(id, raw_buf)
-    elif config == 1:
-        mwait(id, raw_buf)
-    elif config == 2:
-        pwre(id, raw_buf)
-    elif config == 3:
-        exstop(id, raw_buf)
-    elif config == 4:
-        pwrx(id, raw_buf)
-    elif config == 5:
-        cbr(id, raw_buf)
+    if 0 <= config < len(synth_handlers):
+        synth_handlers[config](id, raw_buf)
 
 
 def context_switch_table(*x):
-    bind_exec(
-        cursor, "INSERT INTO context_switches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", x
-    )
+    bind_exec(cursor, INSERT_CONTEXT_SWITCHES, x)
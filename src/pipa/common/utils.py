@@ -26,6 +26,10 @@ class FileFormat(Enum):
         return self.value
 
 
+# Number of leading bytes check_magic needs to tell the formats apart
+MAGIC_SIZE = 270
+
+
 def check_file_format(file: str) -> FileFormat:
     """Check the file format of the given file.
 
@@ -38,25 +42,37 @@ def check_file_format(file: str) -> FileFormat:
     with open(file, "rb") as f:
         # if omitted, will read until EOF
         # the slice is still valid
-        magic = f.read(270)
-        if magic[0:4] == b"\x7f\x45\x4c\x46":
-            # elf file, 4 bytes
-            return FileFormat.elf
-        elif magic[0:6] == b"\xFD\x37\x7A\x58\x5A\x00":
-            # .xz, 6 bytes
-            return FileFormat.xz
-        elif magic[0:3] == b"BZh":
-            # .bz2, 4 bytes
-            return FileFormat.bzip2
-        elif magic[257:263] == b"ustar " or magic == b"gnutar":
-            return FileFormat.tar
-        return FileFormat.other
+        return check_magic(f.read(MAGIC_SIZE))
+
+
+def check_magic(magic: bytes) -> FileFormat:
+    """Check the file format from the leading bytes of a file.
+
+    Args:
+        magic (bytes): the first MAGIC_SIZE bytes of the file, may be shorter
+
+    Returns:
+        file_format: The file format of the given bytes.
+    """
+    if magic[0:4] == b"\x7f\x45\x4c\x46":
+        # elf file, 4 bytes
+        return FileFormat.elf
+    elif magic[0:6] == b"\xFD\x37\x7A\x58\x5A\x00":
+        # .xz, 6 bytes
+        return FileFormat.xz
+    elif magic[0:3] == b"BZh":
+        # .bz2, 4 bytes
+        return FileFormat.bzip2
+    elif magic[257:263] == b"ustar " or magic == b"gnutar":
+        return FileFormat.tar
+    return FileFormat.other
 
 
 def tar(
     output_tar,
     manifest: List[str] | str,
     base_dir: Optional[str] = None,
+    compression: Optional[FileFormat] = None,
 ):
     """Create a tar archive based on a manifest list.
 
@@ -64,8 +80,17 @@ def tar(
         output_tar (str): Path to the output tar file.
         base_dir (str): Base directory to use for relative paths.
         manifest_file (str | List[str]): file or files in tar archive.
+        compression (Optional[FileFormat], optional): Compress the archive while writing it,
+            FileFormat.xz or FileFormat.bzip2. Defaults to None, which writes a plain tar.
     """
-    with tarfile.open(output_tar, mode="w") as tar:
+    if compression is None:
+        mode = "w"
+    elif compression in (FileFormat.xz, FileFormat.bzip2):
+        mode = f"w:{compression}"
+    else:
+        logger.warning(f"not support {compression}'s compress")
+        return
+    with tarfile.open(output_tar, mode=mode) as tar:
         if type(manifest) is str:
             manifest = [manifest]
         non_duplicate_lists: Set[Tuple[str, str]] = set()
@@ -1,5 +1,112 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
+
+try:
+    import orjson  # noqa: F401
+
+    # orjson is much faster than json when serializing large figures to html
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# Above this number of points, markers are dropped from the traces
+MARKERS_MAX_POINTS = 500
+# Above this number of points, traces are rendered with WebGL instead of SVG
+WEBGL_MIN_POINTS = 1000
+# Series are only downsampled when longer than this many times the target size
+LTTB_MIN_RATIO = 4
+
+
+def scatter_mode(points: int) -> str:
+    """Choose the scatter mode based on the number of points of the trace.
+
+    Drawing a marker for every point of a dense series slows down rendering without
+    making the plot more readable, so only lines are drawn above MARKERS_MAX_POINTS.
+
+    Args:
+        points (int): Number of points of the trace.
+
+    Returns:
+        str: "lines" for dense traces, else "lines+markers".
+    """
+    return "lines" if points > MARKERS_MAX_POINTS else "lines+markers"
+
+
+def scatter_type(points: int) -> type:
+    """Choose the scatter trace type based on the number of points of the trace.
+
+    SVG traces add DOM nodes for every point, which makes the browser the bottleneck
+    on long sar and perf stat series, so go.Scattergl is used above WEBGL_MIN_POINTS.
+
+    Args:
+        points (int): Number of points of the trace.
+
+    Returns:
+        type: go.Scattergl for dense traces, else go.Scatter.
+    """
+    return go.Scattergl if points > WEBGL_MIN_POINTS else go.Scatter
+
+
+def lttb_downsample(x, y, n_out: Optional[int] = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample a time series with Largest-Triangle-Three-Buckets (LTTB).
+
+    The first and last points are always kept, the rest of the series is split into
+    n_out - 2 buckets and the point forming the largest triangle with the average of
+    the previous bucket and the average of the next bucket is kept for each bucket.
+    Anchoring on the previous average instead of the previously selected point lets
+    every bucket be solved at once with numpy.
+
+    Series shorter than LTTB_MIN_RATIO * n_out are returned unchanged, the few points
+    saved there are not worth the downsampling.
+
+    Args:
+        x (array-like): X values of the series, must be numeric and sorted.
+        y (array-like): Y values of the series.
+        n_out (Optional[int], optional): Number of points to keep. If None or the series
+            is too short, the series is returned unchanged. Defaults to 2000.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The downsampled x and y values.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    if n_out is None or n_out < 3 or n < LTTB_MIN_RATIO * n_out:
+        return x, y
+    xf = x.astype("float64")
+    yf = y.astype("float64")
+    # bucket edges for the n - 2 inner points, every bucket holds several points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts = edges[:-1]
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(xf[: n - 1], starts) / counts
+    mean_y = np.add.reduceat(yf[: n - 1], starts) / counts
+    # previous bucket average, the first point for the first bucket
+    prev_x = np.concatenate(([xf[0]], mean_x[:-1]))
+    prev_y = np.concatenate(([yf[0]], mean_y[:-1]))
+    # next bucket average, the last point for the last bucket
+    next_x = np.concatenate((mean_x[1:], [xf[-1]]))
+    next_y = np.concatenate((mean_y[1:], [yf[-1]]))
+
+    bucket = np.repeat(np.arange(n_out - 2), counts)
+    inner_x = xf[1 : n - 1]
+    inner_y = yf[1 : n - 1]
+    area = np.abs(
+        (prev_x[bucket] - next_x[bucket]) * (inner_y - prev_y[bucket])
+        - (prev_x[bucket] - inner_x) * (next_y[bucket] - prev_y[bucket])
+    )
+    area[np.isnan(area)] = -np.inf
+    # first point reaching the largest area of its bucket
+    is_max = area == np.maximum.reduceat(area, starts - 1)[bucket]
+    candidates = np.flatnonzero(is_max)
+    _, first = np.unique(bucket[candidates], return_index=True)
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    keep[1:-1] = candidates[first] + 1
+    return x[keep], y[keep]
 
 
 def make_single_plot(
@@ -23,9 +130,8 @@ def make_single_plot(
     Returns:
         go.Figure: The plotly figure.
     """
-    fig = go.Figure()
-    for s in scatters:
-        fig.add_trace(s)
+    # build the figure from all traces at once instead of one add_trace per scatter
+    fig = go.Figure(data=scatters)
     fig.update_layout(
         title=title,
         xaxis_title=xaxis_title,
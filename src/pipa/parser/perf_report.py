@@ -33,9 +33,9 @@ def parse_one_line(s, lr):
             s[lr[3][0] :],
         )
         overhead_cycles, overhead_insns = overhead.split()
-        execution_mode = symbol.split()[0]
-        symbol = " ".join(symbol.split()[1:])
-        execution_mode = execution_mode[1]
+        fields = symbol.split()
+        execution_mode = fields[0][1]
+        symbol = " ".join(fields[1:])
     except Exception as e:
         logger.warning("parse failed for line: " + s + "\n with error: " + str(e))
         return None
@@ -66,29 +66,27 @@ def parse_perf_report_file(parsed_report_path):
             - symbol: The symbol associated with the performance data.
     """
     lr = []
+    data = []
     with open(parsed_report_path, "r") as file:
-        lines = file.readlines()
-        for line in lines:
-            if "......." in line:
-                a = line.strip().removeprefix("#").split()
-                for x in a:
-                    if not lr:
-                        l = line.index(x)
-                        lr.append((l, l + len(x)))
-                    else:
-                        l = line.index(x, lr[-1][1])
-                        lr.append((l, l + len(x)))
-                break
-
-    content = [l for l in lines if not l.startswith("#") and l.strip() != ""]
-
-    if content is None:
-        logger.info("content is None")
-        return None
-
-    data = [parse_one_line(l, lr) for l in content]
-
-    data = [d for d in data if d is not None]
+        # Stream the report once instead of buffering every line: the dotted
+        # header that gives the column ranges precedes the samples.
+        for line in file:
+            if line.startswith("#"):
+                if not lr and "......." in line:
+                    a = line.strip().removeprefix("#").split()
+                    for x in a:
+                        if not lr:
+                            l = line.index(x)
+                            lr.append((l, l + len(x)))
+                        else:
+                            l = line.index(x, lr[-1][1])
+                            lr.append((l, l + len(x)))
+                continue
+            if line.strip() == "":
+                continue
+            d = parse_one_line(line, lr)
+            if d is not None:
+                data.append(d)
 
     logger.info("Successfully parsed data")
     logger.info("parsed data length: " + str(len(data)))
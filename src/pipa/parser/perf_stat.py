@@ -3,7 +3,12 @@ from pandarallel import pandarallel
 from pipa.common.hardware.cpu import NUM_CORES_PHYSICAL
 from pipa.common.logger import logger
 from pipa.common.utils import generate_unique_rgb_color
-from pipa.parser import make_single_plot
+from pipa.parser import (
+    make_single_plot,
+    lttb_downsample,
+    scatter_mode,
+    scatter_type,
+)
 from typing import List, Optional
 import seaborn as sns
 import plotly.graph_objects as go
@@ -460,6 +465,7 @@ class PerfStatData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter]:
         df = self.get_wider_data()
         scatters = []
@@ -480,11 +486,12 @@ class PerfStatData:
             for i, y in enumerate(events):
                 r, g, b = generate_unique_rgb_color([t, i], generate_seed=True)
                 try:
+                    xs, ys = lttb_downsample(data["timestamp"], data[y], max_points)
                     scatters.append(
-                        go.Scatter(
-                            x=data["timestamp"],
-                            y=data[y],
-                            mode="lines+markers",
+                        scatter_type(len(xs))(
+                            x=xs,
+                            y=ys,
+                            mode=scatter_mode(len(xs)),
                             name=f"CPU {t} {y}",
                             # different colors
                             line=dict(color=f"rgb({r}, {g}, {b})"),
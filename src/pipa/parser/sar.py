@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import re
@@ -6,11 +7,17 @@ from pipa.common.hardware.cpu import NUM_CORES_PHYSICAL
 from pipa.common.logger import logger
 from pipa.common.utils import generate_unique_rgb_color
 from enum import Enum, unique
-from typing import Optional, Dict, List, Literal
+from typing import Optional, Dict, List, Literal, Tuple
 import multiprocessing
+from collections import defaultdict
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from pipa.parser import make_single_plot
+from pipa.parser import (
+    make_single_plot,
+    lttb_downsample,
+    scatter_mode,
+    scatter_type,
+)
 
 
 @unique
@@ -407,6 +414,8 @@ class SarDataIndex(Enum):
 
     @classmethod
     def contains(cls, item) -> Optional[Enum]:
+        if isinstance(item, list):
+            return _COLUMNS_TO_SAR_INDEX.get(tuple(item))
         for k in cls:
             if item == k.value:
                 return k
@@ -429,6 +438,12 @@ class SarDataIndex(Enum):
         return hash(self.name)
 
 
+# sar table columns -> sar index, used by SarDataIndex.contains
+_COLUMNS_TO_SAR_INDEX: Dict[tuple, SarDataIndex] = {
+    tuple(k.value): k for k in SarDataIndex if isinstance(k.value, list)
+}
+
+
 class SarData:
     def __init__(self, sar_string: str):
         """
@@ -440,6 +455,10 @@ class SarData:
         """
         self.sar_data: list[pd.DataFrame] = parse_sar_string(sar_string)
         self.saridx_2_colidx: Dict[SarDataIndex, int] = {}
+        # (sar index, data type) -> filtered and typed dataframe
+        self._typed_cache: Dict[Tuple[SarDataIndex, str], pd.DataFrame] = {}
+        # frame index -> whether the frame holds average rows, see filter_dataframe
+        self._has_avg: Dict[int, bool] = {}
         for i, sard in enumerate(self.sar_data):
             scolumns = sard.columns.to_list()
             sindex = SarDataIndex.contains(scolumns)
@@ -449,6 +468,8 @@ class SarData:
                 logger.warning(
                     f"{scolumns} not supported in pipa sar parse, please report an issue"
                 )
+        # all metric frame index -> average frames to append to it
+        plan: Dict[int, List[pd.DataFrame]] = defaultdict(list)
         for sindex in self.saridx_2_colidx.keys():
             all_m = SarDataIndex.avg_metric_to_all_metric(sindex)
             if all_m and all_m in self.saridx_2_colidx:
@@ -456,16 +477,61 @@ class SarData:
                 sindex_i = self.saridx_2_colidx[sindex]
                 avg_pd = self.sar_data[sindex_i]
                 avg_pd = avg_pd.rename(columns={"Average:": "timestamp"})
-                self.sar_data[all_m_i] = (
-                    pd.concat([self.sar_data[all_m_i], avg_pd])
-                    .drop_duplicates()
-                    .reset_index(drop=True)
+                # only append the average rows not already in the all metric frame
+                all_ts = self.sar_data[all_m_i]["timestamp"].unique()
+                avg_pd = avg_pd[~avg_pd["timestamp"].isin(all_ts)]
+                if not avg_pd.empty:
+                    plan[all_m_i].append(avg_pd)
+                    logger.debug(f"combine avg metric {sindex} to all metric {all_m}")
+        for all_m_i, avg_pds in plan.items():
+            self.sar_data[all_m_i] = pd.concat(
+                [self.sar_data[all_m_i], *avg_pds], ignore_index=True, sort=False
+            )
+        for i, sard in enumerate(self.sar_data):
+            if "timestamp" in sard.columns:
+                self._has_avg[i] = bool(
+                    (sard["timestamp"].to_numpy() == "Average:").any()
                 )
-                logger.debug(f"combine avg metric {sindex} to all metric {all_m}")
 
     def get_column_index(self, sar_index: SarDataIndex) -> Optional[int]:
         return self.saridx_2_colidx.get(sar_index)
 
+    def _get_typed(
+        self, sar_index: SarDataIndex, astype_map: Dict[str, str], data_type: str
+    ) -> pd.DataFrame:
+        """
+        Returns the filtered and typed dataframe of the given sar index.
+
+        The whole table is cast once, the detail and average rows are then filtered
+        from the typed table. Results are cached by (sar_index, data_type), so the
+        mask and the cast are only done once per SarData. A copy is returned since
+        callers modify it.
+
+        Args:
+            sar_index (SarDataIndex): The sar data to retrieve.
+            astype_map (Dict[str, str]): Column types to cast the dataframe to.
+            data_type (str): The type of data to retrieve, "detail", "raw" or "average".
+
+        Returns:
+            pd.DataFrame: A copy of the filtered and typed dataframe.
+
+        Raises:
+            KeyError: If the sar index is not found in sar data.
+        """
+        key = (sar_index, data_type)
+        df = self._typed_cache.get(key)
+        if df is None:
+            idx = self.get_column_index(sar_index)
+            if idx is None:
+                raise KeyError(f"{sar_index} not found in sar data")
+            raw = self._typed_cache.get((sar_index, "raw"))
+            if raw is None:
+                raw = self.sar_data[idx].astype(astype_map)
+                self._typed_cache[(sar_index, "raw")] = raw
+            df = self.filter_dataframe(raw, data_type, self._has_avg.get(idx, True))
+            self._typed_cache[key] = df
+        return df.copy()
+
     @classmethod
     def init_with_sar_txt(cls, sar_txt_path: str):
         """
@@ -495,7 +561,7 @@ class SarData:
         sar_content = parse_sar_bin_to_txt(sar_bin_path)
         return cls(sar_content)
 
-    def filter_dataframe(self, df, data_type: str = "detail"):
+    def filter_dataframe(self, df, data_type: str = "detail", has_avg: bool = True):
         """
         Filters the given dataframe based on the specified data type.
 
@@ -505,6 +571,9 @@ class SarData:
         - data_type: str, optional
             The type of data to filter. Valid values are "detail", "raw", and "average".
             Defaults to "detail".
+        - has_avg: bool, optional
+            Whether the dataframe holds average rows at all. If False, the rows are
+            not scanned for them. Defaults to True.
 
         Returns:
         - pandas.DataFrame
@@ -515,11 +584,11 @@ class SarData:
         """
         match data_type:
             case "detail":
-                return df[df["timestamp"] != "Average:"]
+                return df[df["timestamp"] != "Average:"] if has_avg else df
             case "raw":
                 return df
             case "average":
-                return df[df["timestamp"] == "Average:"]
+                return df[df["timestamp"] == "Average:"] if has_avg else df.iloc[:0]
             case _:
                 raise ValueError("Invalid type")
 
@@ -534,13 +603,13 @@ class SarData:
         Returns:
             DataFrame: The filtered DataFrame containing the CPU utilization data.
         """
-        idx = self.get_column_index(SarDataIndex.CPUUtils)
-        if idx is None:
-            raise KeyError(f"{SarDataIndex.CPUUtils} not found in sar data")
-        util = self.filter_dataframe(self.sar_data[idx], data_type).astype(
-            SarDataIndex.CPUUtilsMetrics.value
+        util = self._get_typed(
+            SarDataIndex.CPUUtils, SarDataIndex.CPUUtilsMetrics.value, data_type
         )
-        util[r"%util"] = 100 - util[r"%idle"]
+        idle = util[r"%idle"].to_numpy()
+        busy = np.empty_like(idle)
+        np.subtract(100.0, idle, out=busy)
+        util[r"%util"] = busy
         return util
 
     def get_CPU_util_avg_by_threads(self, threads: list = None):
@@ -555,12 +624,7 @@ class SarData:
             DataFrame: The filtered DataFrame containing the CPU utilization data for the specified threads.
         """
         util = self.get_CPU_utilization("average")
-        util_threads = (
-            util[util["CPU"].isin([str(t) for t in threads])]
-            if threads
-            else util[util["CPU"] == "all"]
-        )
-        return util_threads
+        return util[cpu_mask(util["CPU"], threads, default_all=True)]
 
     def get_CPU_util_avg_summary(self, threads: list = None):
         """
@@ -574,7 +638,11 @@ class SarData:
             dict: A dictionary containing the average CPU utilization summary.
         """
         util_threads = self.get_CPU_util_avg_by_threads(threads)
-        return util_threads.drop(columns=["timestamp", "CPU"]).mean().to_dict()
+        cols = [c for c in util_threads.columns if c not in ("timestamp", "CPU")]
+        if util_threads.empty:
+            return dict.fromkeys(cols, float("nan"))
+        means = util_threads[cols].to_numpy(dtype="float64").mean(axis=0)
+        return dict(zip(cols, means.tolist()))
 
     def plot_interactive_CPU_metrics(
         self,
@@ -598,6 +666,7 @@ class SarData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter] | go.Figure:
         """Plots interactive CPU metrics over time.
 
@@ -609,6 +678,7 @@ class SarData:
                 When in non-aggregation mode, none means display all cpu threads, otherwise display selected threads.
             metrics (List[ Literal[ r, optional): The CPU metrics to show. Defaults to [r"%util"].
             aggregation (bool, optional): Whether to aggregate the data by CPU thread. Defaults to False.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
 
         Returns:
             List[go.Scatter]: list of raw CPU metrics scatters.
@@ -620,22 +690,26 @@ class SarData:
         scatters = []
         if aggregation:
             if threads:
-                df = df[df["CPU"].isin([str(t) for t in threads])]
+                df = df[cpu_mask(df["CPU"], threads)]
                 df = df.groupby("timestamp").mean(numeric_only=True).reset_index()
                 df["CPU"] = "all"
             threads = ["all"]
         elif threads is None:
             threads = list(range(0, cpu_counts))
+        cpu_groups = split_by_cpu(df)
         for t in threads:
-            cpu_data = df[df["CPU"] == str(t)]
+            cpu_data = cpu_groups.get(str(t), df.iloc[:0])
             for i, y in enumerate(metrics):
                 r, g, b = generate_unique_rgb_color([t, i], generate_seed=True)
                 try:
+                    xs, ys = lttb_downsample(
+                        cpu_data["timestamp"], cpu_data[y], max_points
+                    )
                     scatters.append(
-                        go.Scatter(
-                            x=cpu_data["timestamp"],
-                            y=cpu_data[y],
-                            mode="lines+markers",
+                        scatter_type(len(xs))(
+                            x=xs,
+                            y=ys,
+                            mode=scatter_mode(len(xs)),
                             name=f"CPU {t} {y}",
                             # different colors
                             line=dict(color=f"rgb({r}, {g}, {b})"),
@@ -666,11 +740,7 @@ class SarData:
                                       Defaults to None.
         """
         df = self.get_CPU_utilization()
-        df = (
-            df[df["CPU"].isin([str(t) for t in threads])]
-            if threads
-            else df.query("CPU=='all'")
-        )
+        df = df[cpu_mask(df["CPU"], threads, default_all=True)]
         df = trans_time_to_seconds(df)
 
         if threads and len(threads) > 1:
@@ -688,11 +758,8 @@ class SarData:
         Returns:
             pd.DataFrame: Dataframe containing the CPU frequency data.
         """
-        idx = self.get_column_index(SarDataIndex.CPUFreq)
-        if idx is None:
-            raise KeyError(f"{SarDataIndex.CPUFreq} not found in sar data")
-        return self.filter_dataframe(self.sar_data[idx], data_type).astype(
-            {"MHz": "float64"}
+        return self._get_typed(
+            SarDataIndex.CPUFreq, SarDataIndex.CPUFreqMetrics.value, data_type
         )
 
     def plot_interactive_CPU_freq(
@@ -702,6 +769,7 @@ class SarData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter] | go.Figure:
         """
         Plot raw scatters of CPU frequency metrics over time.
@@ -710,6 +778,7 @@ class SarData:
 
         Args:
             threads (Optional[list[int]], optional): CPU threads. Defaults to None, means choose 'all' CPU thread.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
 
         Returns:
             List[go.Scatter]: list of raw scatter plots.
@@ -721,20 +790,22 @@ class SarData:
         scatters = []
         if aggregation:
             if threads:
-                df = df[df["CPU"].isin([str(t) for t in threads])]
+                df = df[cpu_mask(df["CPU"], threads)]
                 df = df.groupby("timestamp").mean(numeric_only=True).reset_index()
                 df["CPU"] = "all"
             threads = ["all"]
         elif threads is None:
             threads = list(range(0, cpu_counts))
+        cpu_groups = split_by_cpu(df)
         for t in threads:
-            cpu_data = df[df["CPU"] == str(t)]
+            cpu_data = cpu_groups.get(str(t), df.iloc[:0])
             r, g, b = generate_unique_rgb_color([t], generate_seed=True)
+            xs, ys = lttb_downsample(cpu_data["timestamp"], cpu_data["MHz"], max_points)
             scatters.append(
-                go.Scatter(
-                    x=cpu_data["timestamp"],
-                    y=cpu_data["MHz"],
-                    mode="lines+markers",
+                scatter_type(len(xs))(
+                    x=xs,
+                    y=ys,
+                    mode=scatter_mode(len(xs)),
                     name=f"CPU {t} Freq",
                     # different colors
                     line=dict(color=f"rgb({r}, {g}, {b})"),
@@ -764,11 +835,7 @@ class SarData:
 
         sns.set_theme(style="darkgrid", rc={"figure.figsize": (15, 8)})
 
-        df = (
-            df[df["CPU"].isin([str(t) for t in threads])]
-            if threads
-            else df.query("CPU=='all'")
-        )
+        df = df[cpu_mask(df["CPU"], threads, default_all=True)]
         df = trans_time_to_seconds(df)
 
         if threads and len(threads) > 1:
@@ -793,7 +860,7 @@ class SarData:
             dict: A dictionary containing the average CPU frequency data for the specified threads.
         """
         df = self.get_CPU_frequency("average")
-        df = df[df["CPU"].isin([str(t) for t in threads])] if threads else df
+        df = df[cpu_mask(df["CPU"], threads)] if threads else df
         if df.empty:
             return {"cpu_frequency_mhz": 0}
         return {"cpu_frequency_mhz": df["MHz"].mean()}
@@ -811,7 +878,13 @@ class SarData:
         util, freq = self.get_CPU_utilization(data_type), self.get_CPU_frequency(
             data_type
         )
-        return pd.merge(util, freq, on=["timestamp", "CPU"])
+        keys = ["timestamp", "CPU"]
+        # both come from the same sar run, usually with rows in the same order
+        if len(util) == len(freq) and np.array_equal(
+            util[keys].to_numpy(), freq[keys].to_numpy()
+        ):
+            return util.assign(MHz=freq["MHz"].to_numpy()).reset_index(drop=True)
+        return pd.merge(util, freq, on=keys, how="inner", sort=False)
 
     def get_network_statistics(
         self, data_type: str = "detail", on_failures: bool = False
@@ -826,15 +899,12 @@ class SarData:
             pd.DataFrame: Dataframe containing the Network Stattistics data.
         """
         sar_loc = SarDataIndex.NetError if on_failures else SarDataIndex.NetUtils
-        idx = self.get_column_index(sar_loc)
-        if idx is None:
-            raise KeyError(f"{sar_loc} not found in sar data")
         astype_t = (
             SarDataIndex.NetErrorMetrics.value
             if on_failures
             else SarDataIndex.NetUtilsMetrics.value
         )
-        return self.filter_dataframe(self.sar_data[idx], data_type).astype(astype_t)
+        return self._get_typed(sar_loc, astype_t, data_type)
 
     def plot_interactive_network_stat(
         self,
@@ -868,6 +938,7 @@ class SarData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter] | go.Figure:
         """
         Plots interactive network statistics over time.
@@ -881,6 +952,7 @@ class SarData:
             trans_metrics (List[Literal], optional): A list of transmission metrics to plot. Defaults to `["%ifutil"]`.
             err_metrics (List[Literal], optional): A list of error metrics to plot. Defaults to `["rxerr/s"]`.
             on_failures (bool, optional): If True, plots error metrics; otherwise, plots transmission metrics. Defaults to False.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
 
         Returns:
             List[go.Scatter]: A list of Plotly Scatter objects representing the time series data for each device and metric.
@@ -897,11 +969,14 @@ class SarData:
             for i, y in enumerate(metrics):
                 r, g, b = generate_unique_rgb_color([t, i], generate_seed=True)
                 try:
+                    xs, ys = lttb_downsample(
+                        dev_data["timestamp"], dev_data[y], max_points
+                    )
                     scatters.append(
-                        go.Scatter(
-                            x=dev_data["timestamp"],
-                            y=dev_data[y],
-                            mode="lines+markers",
+                        scatter_type(len(xs))(
+                            x=xs,
+                            y=ys,
+                            mode=scatter_mode(len(xs)),
                             name=f"IFACE {t} {y}",
                             # different colors
                             line=dict(color=f"rgb({r}, {g}, {b})"),
@@ -924,10 +999,8 @@ class SarData:
             )
 
     def get_network_statistics_avg(self, on_failures: bool = False):
-        return (
+        return df_to_records(
             self.get_network_statistics(data_type="average", on_failures=on_failures)
-            .drop(columns=["timestamp"])
-            .to_dict(orient="records")
         )
 
     def get_memory_usage(self, data_type: str = "detail"):
@@ -940,11 +1013,8 @@ class SarData:
         Returns:
             pd.DataFrame: Dataframe containing the memory usage data.
         """
-        idx = self.get_column_index(SarDataIndex.MemoryStats)
-        if idx is None:
-            raise KeyError(f"{SarDataIndex.MemoryStats} not found in sar data")
-        return self.filter_dataframe(self.sar_data[idx], data_type).astype(
-            SarDataIndex.MemoryStatsMetrics.value
+        return self._get_typed(
+            SarDataIndex.MemoryStats, SarDataIndex.MemoryStatsMetrics.value, data_type
         )
 
     def plot_interactive_mem_usage(
@@ -972,6 +1042,7 @@ class SarData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter] | go.Figure:
         """
         Generates interactive memory usage time series plots.
@@ -982,6 +1053,7 @@ class SarData:
 
         Args:
             metrics (List[Literal], optional): A list of memory metrics to plot. Defaults to `["%memused"]`.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
 
         Returns:
             List[go.Scatter]: A list of Plotly Scatter objects representing the time series data for each memory metric.
@@ -993,11 +1065,12 @@ class SarData:
         for i, y in enumerate(metrics):
             r, g, b = generate_unique_rgb_color([i], generate_seed=True)
             try:
+                xs, ys = lttb_downsample(df["timestamp"], df[y], max_points)
                 scatters.append(
-                    go.Scatter(
-                        x=df["timestamp"],
-                        y=df[y],
-                        mode="lines+markers",
+                    scatter_type(len(xs))(
+                        x=xs,
+                        y=ys,
+                        mode=scatter_mode(len(xs)),
                         name=f"memory {y}",
                         # different colors
                         line=dict(color=f"rgb({r}, {g}, {b})"),
@@ -1026,11 +1099,7 @@ class SarData:
         Returns:
             dict: A dictionary containing the average memory usage data.
         """
-        return (
-            self.get_memory_usage("average")
-            .drop(columns=["timestamp"])
-            .to_dict(orient="records")[0]
-        )
+        return df_to_records(self.get_memory_usage("average"))[0]
 
     def plot_memory_usage(self):
         """
@@ -1050,11 +1119,10 @@ class SarData:
         Returns:
             pd.DataFrame: Dataframe containing the disk usage data.
         """
-        idx = self.get_column_index(SarDataIndex.DeviceIOStats)
-        if idx is None:
-            raise KeyError(f"{SarDataIndex.DeviceIOStats} not found in sar data")
-        df = self.filter_dataframe(self.sar_data[idx], data_type).astype(
-            SarDataIndex.DeviceIOStatsMetrics.value
+        df = self._get_typed(
+            SarDataIndex.DeviceIOStats,
+            SarDataIndex.DeviceIOStatsMetrics.value,
+            data_type,
         )
         return df[df["DEV"] == dev] if dev else df
 
@@ -1076,6 +1144,7 @@ class SarData:
         raw_data: bool = False,
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
     ) -> List[go.Scatter] | go.Figure:
         """
         Generates interactive disk usage time series plots.
@@ -1087,6 +1156,7 @@ class SarData:
         Args:
             devs (list[str]): A list of disk device names to include in the plot.
             metrics (List[Literal], optional): A list of disk usage metrics to plot. Defaults to `["%util"]`.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
 
         Returns:
             List[go.Scatter]: A list of Plotly Scatter objects representing the time series data for each disk device and metric.
@@ -1102,11 +1172,14 @@ class SarData:
             for i, y in enumerate(metrics):
                 r, g, b = generate_unique_rgb_color([t, i], generate_seed=True)
                 try:
+                    xs, ys = lttb_downsample(
+                        cpu_data["timestamp"], cpu_data[y], max_points
+                    )
                     scatters.append(
-                        go.Scatter(
-                            x=cpu_data["timestamp"],
-                            y=cpu_data[y],
-                            mode="lines+markers",
+                        scatter_type(len(xs))(
+                            x=xs,
+                            y=ys,
+                            mode=scatter_mode(len(xs)),
                             name=f"DEV {t} {y}",
                             # different colors
                             line=dict(color=f"rgb({r}, {g}, {b})"),
@@ -1139,11 +1212,9 @@ class SarData:
             list: A list of dictionaries containing the average disk usage data for each device.
             if dev is specified, returns a single dictionary.
         """
-        disk_usage_avg = (
-            self.get_disk_usage(dev, "average")
-            .drop(columns=["timestamp"])
-            .rename(columns={"%util": "%disk_util", "await": "disk_await"})
-            .to_dict(orient="records")
+        disk_usage_avg = df_to_records(
+            self.get_disk_usage(dev, "average"),
+            rename={"%util": "%disk_util", "await": "disk_await"},
         )
         return disk_usage_avg[0] if dev else disk_usage_avg
 
@@ -1239,6 +1310,7 @@ class SarData:
         ] = [r"%util"],
         show: bool = True,
         write_to_html: Optional[str] = None,
+        max_points: Optional[int] = 2000,
         height=1000,
         shared_xaxes=True,
         vertical_spacing=0.1,
@@ -1263,69 +1335,79 @@ class SarData:
             height (int, optional): The height of the plot in pixels. Defaults to 1000.
             shared_xaxes (bool, optional): Whether to share the x-axis across subplots. Defaults to True.
             vertical_spacing (float, optional): The vertical spacing between subplots. Defaults to 0.1.
+            max_points (Optional[int], optional): Downsample every trace to at most max_points points with LTTB. None keeps all points. Defaults to 2000.
         """
         cpu_util_scatters = self.plot_interactive_CPU_metrics(
             threads=cpu_threads,
             metrics=cpu_metrics,
             aggregation=cpu_aggregation,
             raw_data=True,
+            max_points=max_points,
         )
         cpu_freq_scatters = self.plot_interactive_CPU_freq(
-            threads=cpu_threads, raw_data=True
+            threads=cpu_threads, raw_data=True, max_points=max_points
         )
         net_trans_scatters = self.plot_interactive_network_stat(
             on_failures=False,
             devs=net_devs,
             trans_metrics=net_trans_metrics,
             raw_data=True,
+            max_points=max_points,
         )
         net_err_scatters = self.plot_interactive_network_stat(
-            on_failures=True, devs=net_devs, err_metrics=net_err_metrics, raw_data=True
+            on_failures=True,
+            devs=net_devs,
+            err_metrics=net_err_metrics,
+            raw_data=True,
+            max_points=max_points,
         )
         mem_scatters = self.plot_interactive_mem_usage(
-            metrics=mem_metrics, raw_data=True
+            metrics=mem_metrics, raw_data=True, max_points=max_points
         )
         disk_scatters = self.plot_interactive_disk_usage(
-            devs=disk_devs, metrics=disk_metrics, raw_data=True
+            devs=disk_devs,
+            metrics=disk_metrics,
+            raw_data=True,
+            max_points=max_points,
         )
-        # subtitle: scatters, x_title, y_title
-        all_scatters = {
-            "CPU Utilization": (cpu_util_scatters, "timestamp", "Percentage"),
-            "CPU Frequency": (cpu_freq_scatters, "timestamp", "MHz"),
-            "Network Transmission": (net_trans_scatters, "timestamp", "Net Stat"),
-            "Network Error": (net_err_scatters, "timestamp", "Net Stat"),
-            "Memory Usage": (mem_scatters, "timestamp", "Memory Usage"),
-            "Disk Usage": (disk_scatters, "timestamp", "Disk Usage"),
-        }
-        rows = 0
+        # subtitle, scatters, x_title, y_title
+        all_scatters = [
+            ("CPU Utilization", cpu_util_scatters, "timestamp", "Percentage"),
+            ("CPU Frequency", cpu_freq_scatters, "timestamp", "MHz"),
+            ("Network Transmission", net_trans_scatters, "timestamp", "Net Stat"),
+            ("Network Error", net_err_scatters, "timestamp", "Net Stat"),
+            ("Memory Usage", mem_scatters, "timestamp", "Memory Usage"),
+            ("Disk Usage", disk_scatters, "timestamp", "Disk Usage"),
+        ]
+        # skip empty subplots and collect traces, rows and axis titles in one pass
         sub_titles = []
-        exist_scatters = {}
-        for k, v in all_scatters.items():
-            s, _, _ = v
-            if len(s) > 0:
-                rows += 1
-                sub_titles.append(k)
-                # scatters, x_title, y_title
-                exist_scatters[k] = v
+        traces = []
+        trace_rows = []
+        axes = {}
+        for title, s, xt, yt in all_scatters:
+            if not s:
+                continue
+            sub_titles.append(title)
+            row = len(sub_titles)
+            traces.extend(s)
+            trace_rows.extend([row] * len(s))
+            axes[f"xaxis{row}"] = dict(title_text=xt)
+            axes[f"yaxis{row}"] = dict(title_text=yt)
         fig = make_subplots(
-            rows=rows,
+            rows=len(sub_titles),
             cols=1,
             subplot_titles=sub_titles,
             # Share same x axis since all is timestamp
             shared_xaxes=shared_xaxes,
             vertical_spacing=vertical_spacing,
         )
-        for i, (_, v) in enumerate(exist_scatters.items()):
-            s, xt, yt = v
-            for scatter in s:
-                fig.add_trace(scatter, row=i + 1, col=1)
-            fig.update_xaxes(title_text=xt, row=i + 1, col=1)
-            fig.update_yaxes(title_text=yt, row=i + 1, col=1)
+        fig.add_traces(traces, rows=trace_rows, cols=1)
         fig.update_layout(
             title="System Metrics Trends",
             hovermode="closest",
             height=height,
             showlegend=True,
+            **axes,
         )
         if show:
             fig.show()
@@ -1334,6 +1416,67 @@ class SarData:
         return fig
 
 
+def cpu_mask(
+    cpu: pd.Series, threads: Optional[list] = None, default_all: bool = False
+) -> np.ndarray:
+    """
+    Builds the boolean mask of the rows belonging to the given CPU threads.
+
+    Args:
+        cpu (pd.Series): The CPU column of a sar dataframe.
+        threads (Optional[list], optional): CPU threads to select. Defaults to None.
+        default_all (bool, optional): If threads is empty, select the 'all' rows
+            instead of every row. Defaults to False.
+
+    Returns:
+        np.ndarray: The boolean mask.
+    """
+    if threads:
+        return cpu.isin([str(t) for t in threads]).to_numpy()
+    if default_all:
+        return (cpu == "all").to_numpy()
+    return np.ones(len(cpu), dtype=bool)
+
+
+def df_to_records(
+    df: pd.DataFrame,
+    exclude: tuple = ("timestamp",),
+    rename: Optional[Dict[str, str]] = None,
+) -> List[dict]:
+    """
+    Converts the dataframe to a list of records, leaving out the excluded columns.
+
+    Same as df.drop(columns=exclude).rename(columns=rename).to_dict(orient="records"),
+    but reads the selected columns directly instead of building intermediate copies.
+
+    Args:
+        df (pd.DataFrame): The dataframe to convert.
+        exclude (tuple, optional): Columns to leave out. Defaults to ("timestamp",).
+        rename (Optional[Dict[str, str]], optional): Keys to use instead of the
+            column names. Defaults to None.
+
+    Returns:
+        List[dict]: One dictionary per row, column -> value.
+    """
+    cols = [c for c in df.columns if c not in exclude]
+    values = [df[c].tolist() for c in cols]
+    keys = [rename.get(c, c) for c in cols] if rename else cols
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def split_by_cpu(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Splits the sar dataframe by its CPU column in a single pass.
+
+    Args:
+        df (pd.DataFrame): The sar dataframe with a CPU column.
+
+    Returns:
+        Dict[str, pd.DataFrame]: CPU thread -> rows of that thread.
+    """
+    return {str(k): v for k, v in df.groupby("CPU", sort=False)}
+
+
 def parse_sar_bin_to_txt(sar_bin_path: str):
     """
     Parses the SAR binary file into a list of lines.
@@ -1466,16 +1609,15 @@ def process_subtable(
     return res
 
 
-def sar_to_df(sar_blocks: list):
+def split_sar_header(sar_blocks: list):
     """
-    Convert SAR blocks to a pandas DataFrame.
+    Split SAR blocks into its columns and its data lines.
 
     Args:
         sar_blocks (list): A list of SAR blocks.
 
     Returns:
-        pandas.DataFrame: A DataFrame containing the processed SAR data.
-
+        tuple: The list of SAR columns and the list of data lines.
     """
     while sar_blocks[0] == "":
         sar_blocks = sar_blocks[1:]
@@ -1484,8 +1626,23 @@ def sar_to_df(sar_blocks: list):
     sar_columns = sar_blocks[0].split()
     if re.match(time_pattern, sar_columns[0]):
         sar_columns = ["timestamp"] + sar_columns[1:]
+    return sar_columns, sar_blocks[1:]
+
+
+def sar_to_df(sar_blocks: list):
+    """
+    Convert SAR blocks to a pandas DataFrame.
+
+    Args:
+        sar_blocks (list): A list of SAR blocks.
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the processed SAR data.
+
+    """
+    sar_columns, sar_lines = split_sar_header(sar_blocks)
     return pd.DataFrame(
-        process_subtable(sar_columns, sar_blocks[1:]),
+        process_subtable(sar_columns, sar_lines),
         columns=sar_columns,
     )
 
@@ -1530,13 +1687,13 @@ def parse_sar_string(sar_string: str):
         List[pd.DataFrame]: A list of dataframes containing the parsed SAR data.
     """
     sar_data = split_sar_block(sar_string)[1:]
-    a = [sar_to_df(d) for d in sar_data]
-    l = 0
-    res = []
-    while l < len(a):  # merge dataframes with the same columns, use two pointers
-        r = l + 1
-        while r < len(a) and a[r].columns.equals(a[l].columns):
-            r += 1
-        res.append(pd.concat(a[l:r], axis=0))
-        l = r
-    return res
+    # merge the lines of consecutive blocks with the same columns,
+    # and build a single dataframe for each of them
+    tables = []
+    for d in sar_data:
+        sar_columns, sar_lines = split_sar_header(d)
+        if tables and tables[-1][0] == sar_columns:
+            tables[-1][1].extend(sar_lines)
+        else:
+            tables.append((sar_columns, list(sar_lines)))
+    return [pd.DataFrame(process_subtable(c, lines), columns=c) for c, lines in tables]
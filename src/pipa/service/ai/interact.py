@@ -12,9 +12,11 @@ from langchain.agents import create_tool_calling_agent, AgentExecutor
 from pipa.common.logger import logger, stream_handler
 
 Msgs: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
-Inputs: Dict[str, Dict[str, Any]] = defaultdict(lambda: defaultdict(lambda: ""))
+Inputs: Dict[str, Dict[str, Any]] = {}
 Tools: Dict[str, List[Callable]] = defaultdict(list)
 
+INPUT_PATTERN = re.compile(r"\{([a-zA-Z_][a-zA-Z0-9_]*)\}")
+
 
 def extract_strings_variables(s: str) -> Optional[List[str]]:
     """Extract inputs from a string
@@ -25,13 +27,14 @@ def extract_strings_variables(s: str) -> Optional[List[str]]:
     Returns:
         Optional[List[str]]: Inputs name list
     """
+    # most messages have no inputs at all, skip the format probe for them
+    if "{" not in s:
+        return None
     try:
         s.format()
         return None
     except KeyError:
-        pattern = r"\{([a-zA-Z_][a-zA-Z0-9_]*)\}"
-        matches = re.findall(pattern, s)
-        return matches
+        return INPUT_PATTERN.findall(s)
 
 
 def add_msg(
@@ -52,10 +55,10 @@ def add_msg(
         case "human" | "system" | "placeholder" | "ai":
             Msgs[chat_index].append((role, msg))
             vars = extract_strings_variables(msg)
-            if vars is not None:
+            if vars is not None and input is not None:
+                inputs = Inputs.setdefault(chat_index, {})
                 for v in vars:
-                    if input is not None:
-                        Inputs[chat_index][v] = input
+                    inputs[v] = input
         case "agent":
             Msgs[chat_index].append(("placeholder", "{agent_scratchpad}"))
 
@@ -100,6 +103,13 @@ class Model:
         )
         self._parser = StrOutputParser()
         self._chain = self._model | self._parser
+        # Msgs and Tools are append-only, so their lengths tell whether a
+        # cached prompt or agent still matches its chat.
+        self._prompts: Dict[str, Tuple[Tuple[int, int], ChatPromptTemplate]] = {}
+        self._agents: Dict[str, Tuple[Tuple[int, int], AgentExecutor]] = {}
+
+    def _chat_key(self, chat_index: str) -> Tuple[int, int]:
+        return len(Msgs[chat_index]), len(Tools[chat_index])
 
     @enabled
     def invoke(self, chat_index: str) -> str:
@@ -111,9 +121,13 @@ class Model:
         Returns:
             str: the output
         """
-        msg = Msgs[chat_index]
-        input = Inputs[chat_index]
-        prompt_v = ChatPromptTemplate.from_messages(msg).invoke(input)
+        key = self._chat_key(chat_index)
+        cached = self._prompts.get(chat_index)
+        if cached is None or cached[0] != key:
+            cached = key, ChatPromptTemplate.from_messages(Msgs[chat_index])
+            self._prompts[chat_index] = cached
+        input = Inputs.get(chat_index, {})
+        prompt_v = cached[1].invoke(input)
         return self._chain.invoke(prompt_v)
 
     @enabled
@@ -126,12 +140,17 @@ class Model:
         Returns:
             Dict[str, Any]: the output
         """
-        msg = Msgs[chat_index]
-        tools = Tools[chat_index]
-        input = Inputs[chat_index]
-        agent = create_tool_calling_agent(self._model, Tools[chat_index], msg)
-        agent_exe = AgentExecutor(agent=agent, tools=tools, verbose=True)
-        return agent_exe.invoke(input=input)
+        key = self._chat_key(chat_index)
+        cached = self._agents.get(chat_index)
+        if cached is None or cached[0] != key:
+            msg = Msgs[chat_index]
+            tools = Tools[chat_index]
+            agent = create_tool_calling_agent(self._model, tools, msg)
+            agent_exe = AgentExecutor(agent=agent, tools=tools, verbose=True)
+            cached = key, agent_exe
+            self._agents[chat_index] = cached
+        input = Inputs.get(chat_index, {})
+        return cached[1].invoke(input=input)
 
 
 def main():
@@ -6,18 +6,23 @@ from pipa.common.utils import (
     tar,
     process_compression,
     FileFormat,
-    check_file_format,
+    MAGIC_SIZE,
+    check_magic,
 )
 from pipa.parser.perf_buildid import PerfBuildidData
 from pipa.common.cmd import run_command
 from pipa.service.call_graph.addr import DEFAULT_BUILD_ID_DIR
-from typing import List, Dict
+from typing import BinaryIO, List, Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from tempfile import mktemp, mkdtemp
 import os
 
 
 def find_all_source_files(dwarfinfo: DWARFInfo) -> List[str]:
-    source_files = []
+    # headers are listed by every CU that includes them, keep each path once
+    # and only resolve each (comp dir, file) pair once
+    source_files: Dict[str, None] = {}
+    resolved: Set[Tuple[str, str]] = set()
     # Iter all Compile Units, may be a source file or part of it.
     for CU in dwarfinfo.iter_CUs():
         # get the compile unit's line program (includes mapping from machine codes to souce codes)
@@ -33,17 +38,19 @@ def find_all_source_files(dwarfinfo: DWARFInfo) -> List[str]:
             else:
                 relative_dir = comp_dir.value.decode("utf-8")  # type: ignore
         delta = 1 if lineprog.header.version < 5 else 0
+        include_dirs = [d.decode("utf-8") for d in lineprog["include_directory"]]
 
         for file_entry in lineprog["file_entry"]:
             file_name = file_entry.name.decode("utf-8")
             dir_index = file_entry.dir_index
             try:
-                dir_name = lineprog["include_directory"][dir_index - delta].decode(
-                    "utf-8"
-                )
+                dir_name = include_dirs[dir_index - delta]
             except IndexError:
                 dir_name = ""
             file_name = os.path.join(dir_name, file_name)
+            if (relative_dir, file_name) in resolved:
+                continue
+            resolved.add((relative_dir, file_name))
             if not os.path.exists(file_name):
                 d = os.path.join(relative_dir, file_name)
                 if not os.path.exists(d):
@@ -52,12 +59,76 @@ def find_all_source_files(dwarfinfo: DWARFInfo) -> List[str]:
                 else:
                     file_name = d
             realpath = os.path.realpath(file_name)
-            source_files.append(realpath)
+            source_files[realpath] = None
             if os.path.islink(file_name):
                 abspath = os.path.abspath(file_name)
                 if abspath != realpath:
-                    source_files.append(abspath)
-    return source_files
+                    source_files[abspath] = None
+    return list(source_files)
+
+
+def find_elf_source_files(module: str, f: BinaryIO) -> List[str]:
+    """Find the source files of an opened elf file from its dwarf info
+
+    Args:
+        module (str): path to the elf file, for logging
+        f (BinaryIO): the opened elf file
+
+    Returns:
+        List[str]: the source files, empty if the elf file has no usable debuginfo
+    """
+    elffile = ELFFile(f)
+    if not elffile.has_dwarf_info():
+        logger.warning(f"{module} has no dwarf info, please provide debuginfo")
+        return []
+    # get dwarf info
+    dwarfinfo = elffile.get_dwarf_info()
+    if not dwarfinfo.has_debug_info:
+        logger.warning(f"{module}'s dwarf lost debuginfo, check your compile methods")
+        return []
+    return find_all_source_files(dwarfinfo=dwarfinfo)
+
+
+def scan_module(module: str) -> List[str]:
+    """Find the source files of a module from its dwarf info
+
+    Args:
+        module (str): path to the module, an elf file or a xz compressed one
+
+    Returns:
+        List[str]: the source files, empty if the module has no usable debuginfo
+    """
+    if not os.path.exists(module):
+        logger.warning(f"Not found ELF File {module} in buildid list")
+        return []
+    # check if it's an elf file with debuginfo
+    # if it's a compress file, extract to a tmpdir and will use the extracted elf file (if it contains) for further processing
+    # if it's not a compress file or elf file, pass
+    with open(module, "rb") as f:
+        # check the magic on the same handle the elf file is parsed from
+        fformat = check_magic(f.read(MAGIC_SIZE))
+        if fformat == FileFormat.elf:
+            return find_elf_source_files(module, f)
+    if fformat != FileFormat.xz:
+        return []
+    # buildid will generate a xz compressed file named like drm_vram_helper.ko.xz
+    # it contains debuginfo elf, named like drm_vram_helper.ko
+    tmpd = mkdtemp()
+    extracted, _ = os.path.splitext(os.path.basename(module))
+    extracted = os.path.join(tmpd, extracted)
+    process_compression(
+        compressed=module,
+        decompressed=extracted,
+        format=FileFormat.xz,
+        decompress=True,
+    )
+    if not os.path.exists(extracted):
+        logger.warning(
+            f"Extract {module} to {tmpd}, but expected elf file {extracted} not found"
+        )
+        return []
+    with open(extracted, "rb") as f:
+        return find_elf_source_files(extracted, f)
 
 
 def get_archive_manifest(
@@ -71,9 +142,23 @@ def get_archive_manifest(
     for build_id in builid_data.buildid_lists.values():
         linkname = f".build-id/{build_id[0:2]}/{build_id[2:]}"
         linkfile = os.path.join(perf_buildid_dir, linkname)
-        realfile = os.path.realpath(linkfile)
         manifest.append(linkname)
-        manifest.append(os.path.relpath(realfile, perf_buildid_linkdir))
+        # perf links .build-id/xx/yyyy to ../../<path>/<build id>, resolve that
+        # relative target with one readlink instead of a realpath walk
+        try:
+            target = os.readlink(linkfile)
+        except OSError:
+            target = ""
+        realname = os.path.normpath(os.path.join(os.path.dirname(linkname), target))
+        if (
+            not target
+            or os.path.isabs(target)
+            or realname.startswith("..")
+            or os.path.islink(os.path.join(perf_buildid_dir, realname))
+        ):
+            realfile = os.path.realpath(linkfile)
+            realname = os.path.relpath(realfile, perf_buildid_linkdir)
+        manifest.append(realname)
     return manifest
 
 
@@ -110,85 +195,34 @@ def archive(
     for bid in f"{perf_buildid_data.to_raw_dataframe()}".splitlines():
         logger.debug(bid)
     modules_list = perf_buildid_data.get_modules()
-    # apply module replace
-    for i in range(len(modules_list)):
-        for o, v in replace_modules.items():
-            m = modules_list[i]
-            if m != o:
-                continue
-            modules_list[i] = v
+    # apply module replace, modules replaced by the same one are scanned once
+    modules_list = list(dict.fromkeys(replace_modules.get(m, m) for m in modules_list))
     logger.debug("Final module list:")
     for i, m in enumerate(modules_list):
         logger.debug(f"{i}: {m}")
     source_files = []
-    for module in modules_list:
-        if not os.path.exists(module):
-            logger.warning(f"Not found ELF File {module} in buildid list")
-            continue
-        # check if it's an elf file with debuginfo
-        # if it's a compress file, extract to a tmpdir and will use the extracted elf file (if it contains) for further processing
-        # if it's not a compress file or elf file, pass
-        fformat = check_file_format(module)
-        if fformat == FileFormat.xz:
-            # buildid will generate a xz compressed file named like drm_vram_helper.ko.xz
-            # it contains debuginfo elf, named like drm_vram_helper.ko
-            tmpd = mkdtemp()
-            extracted, _ = os.path.splitext(os.path.basename(module))
-            extracted = os.path.join(tmpd, extracted)
-            process_compression(
-                compressed=module,
-                decompressed=extracted,
-                format=FileFormat.xz,
-                decompress=True,
-            )
-            if not os.path.exists(extracted):
-                logger.warning(
-                    f"Extract {module} to {tmpd}, but expected elf file {extracted} not found"
-                )
-                continue
-            module = extracted
-        elif fformat != FileFormat.elf:
-            continue
-        # open elf file
-        f = open(module, "rb")
-        elffile = ELFFile(f)
-        if not elffile.has_dwarf_info():
-            logger.warning(f"{module} has no dwarf info, please provide debuginfo")
-            f.close()
-            continue
-        # get dwarf info
-        dwarfinfo = elffile.get_dwarf_info()
-        if not dwarfinfo.has_debug_info:
-            logger.warning(
-                f"{module}'s dwarf lost debuginfo, check your compile methods"
-            )
-            continue
-        source_files.extend(find_all_source_files(dwarfinfo=dwarfinfo))
-        f.close()
+    # modules are independent and pyelftools is pure python, parse them in parallel
+    with ProcessPoolExecutor(
+        max_workers=min(len(modules_list), os.cpu_count() or 1) or 1
+    ) as executor:
+        for files in executor.map(scan_module, modules_list):
+            source_files.extend(files)
     # get archive manifest
     archive_files = get_archive_manifest(perf_buildid_data)
     # generate archive
-    buildid_tar = os.path.join(output_path, f"{perf_data}.buildid.tar")
-    buildid_bz2 = f"{buildid_tar}.bz2"
-    sourcefiles_tar = os.path.join(output_path, f"{perf_data}.sourcefiles.tar")
-    sourcefiles_bz2 = f"{sourcefiles_tar}.bz2"
+    buildid_bz2 = os.path.join(output_path, f"{perf_data}.buildid.tar.bz2")
+    sourcefiles_bz2 = os.path.join(output_path, f"{perf_data}.sourcefiles.tar.bz2")
+    # compress while archiving, no intermediate tar is written and read back
     tar(
-        output_tar=buildid_tar,
+        output_tar=buildid_bz2,
         base_dir=DEFAULT_BUILD_ID_DIR,
         manifest=archive_files,
+        compression=FileFormat.bzip2,
     )
-    process_compression(
-        decompressed=buildid_tar,
-        compressed=buildid_bz2,
-        format=FileFormat.bzip2,
-        decompress=False,
-    )
-    tar(output_tar=sourcefiles_tar, manifest=source_files)
-    process_compression(
-        decompressed=sourcefiles_tar,
-        compressed=sourcefiles_bz2,
-        format=FileFormat.bzip2,
-        decompress=False,
+    tar(
+        output_tar=sourcefiles_bz2,
+        manifest=source_files,
+        compression=FileFormat.bzip2,
     )
     print(f"Created buildid archive: {buildid_bz2}")
     print(f"Created sourcefiles archive: {sourcefiles_bz2}")
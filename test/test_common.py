@@ -1,6 +1,7 @@
+import tarfile
 import pytest
 from unittest.mock import patch, mock_open
-from pipa.common.utils import FileFormat, check_file_format
+from pipa.common.utils import FileFormat, check_file_format, check_magic, tar
 
 
 @patch(
@@ -33,5 +34,28 @@ def test_check_file_format_other(mock_open):
     mock_open.assert_called_with("test.xz", "rb")
 
 
+def test_check_magic():
+    assert check_magic(b"\x7f\x45\x4c\x46\x02\x01") == FileFormat.elf
+    assert check_magic(b"BZh9") == FileFormat.bzip2
+    assert check_magic(b"\x00" * 257 + b"ustar \x00") == FileFormat.tar
+    assert check_magic(b"") == FileFormat.other
+
+
+@pytest.mark.parametrize("compression", [FileFormat.bzip2, FileFormat.xz])
+def test_tar_compression(tmp_path, compression):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    output = tmp_path / f"out.tar.{compression}"
+    tar(
+        output_tar=str(output),
+        manifest=["a.txt", "b.txt", "missing.txt", "a.txt"],
+        base_dir=str(tmp_path),
+        compression=compression,
+    )
+    assert check_file_format(str(output)) == compression
+    with tarfile.open(output) as t:
+        assert sorted(t.getnames()) == ["a.txt", "b.txt"]
+
+
 if __name__ == "__main__":  # pragma: no cover
     pytest.main([__file__])
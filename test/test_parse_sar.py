@@ -1,5 +1,6 @@
 import pytest
 import pandas as pd
+import matplotlib.pyplot as plt
 from pipa.parser.sar import (
     trans_time_to_seconds,
     merge_one_line,
@@ -7,6 +8,9 @@ from pipa.parser.sar import (
     split_sar_block,
     parse_sar_string,
     SarDataIndex,
+    SarData,
+    cpu_mask,
+    df_to_records,
 )
 
 
@@ -40,6 +44,30 @@ def test_avg_metric_to_all_metric():
     assert e2 == SarDataIndex.CPUUtils
 
 
+# Test for contains
+def test_contains():
+    assert SarDataIndex.contains(SarDataIndex.CPUUtils.value) == SarDataIndex.CPUUtils
+    assert SarDataIndex.contains(["Average:", "CPU", "MHz"]) == SarDataIndex.AvgCPUFreq
+    assert SarDataIndex.contains(["timestamp", "unknown"]) is None
+
+
+# Test for df_to_records
+def test_df_to_records():
+    df = pd.DataFrame(
+        {
+            "timestamp": ["Average:", "Average:"],
+            "IFACE": ["lo", "eth0"],
+            "rxpck/s": [1.5, 2.0],
+        }
+    )
+    assert df_to_records(df) == df.drop(columns=["timestamp"]).to_dict(orient="records")
+    assert df_to_records(df.iloc[:0]) == []
+    assert df_to_records(df, rename={"rxpck/s": "rx"}) == [
+        {"IFACE": "lo", "rx": 1.5},
+        {"IFACE": "eth0", "rx": 2.0},
+    ]
+
+
 # Test for merge_one_line
 @pytest.mark.parametrize(
     "sar_line, expected",
@@ -102,6 +130,20 @@ def test_split_sar_block(lines, expected):
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    "threads, default_all, expected",
+    [
+        ([0, 2], False, [False, True, False, True]),
+        (None, True, [True, False, False, False]),
+        (None, False, [True, True, True, True]),
+    ],
+)
+def test_cpu_mask(threads, default_all, expected):
+    cpu = pd.Series(["all", "0", "1", "2"])
+    mask = cpu_mask(cpu, threads, default_all)
+    assert mask.tolist() == expected
+
+
 # Test for parse_sar_string
 def test_parse_sar_string():
     sar_string = """
@@ -170,5 +212,87 @@ Linux 5.15.0-113-generic (black)    07/15/24    _x86_64_    (160 CPU)
     )
 
 
+SAR_STRING = """Linux 5.15.0 (host)    07/15/24    _x86_64_    (3 CPU)
+
+10:00:00        CPU      %usr     %nice      %sys   %iowait    %steal      %irq     %soft    %guest    %gnice     %idle
+10:00:01        all      4.00      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     95.00
+10:00:01          0      6.00      0.00      2.00      0.00      0.00      0.00      0.00      0.00      0.00     92.00
+10:00:01          1      3.00      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     96.00
+10:00:01          2      3.00      0.00      0.00      0.00      0.00      0.00      0.00      0.00      0.00     97.00
+10:00:02        all      5.00      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     94.00
+10:00:02          0      7.00      0.00      2.00      0.00      0.00      0.00      0.00      0.00      0.00     91.00
+10:00:02          1      4.00      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     95.00
+10:00:02          2      4.00      0.00      0.00      0.00      0.00      0.00      0.00      0.00      0.00     96.00
+
+10:00:00          DEV       tps     rkB/s     wkB/s     dkB/s   areq-sz    aqu-sz     await     %util
+10:00:01          sda      1.00      0.00      4.00      0.00      4.00      0.00      0.50      0.10
+10:00:01          sdb      2.00      8.00      0.00      0.00      4.00      0.00      0.50      0.20
+10:00:02          sda      3.00      0.00     12.00      0.00      4.00      0.00      0.50      0.30
+10:00:02          sdb      4.00     16.00      0.00      0.00      4.00      0.00      0.50      0.40
+
+10:00:00        IFACE   rxpck/s   txpck/s    rxkB/s    txkB/s   rxcmp/s   txcmp/s  rxmcst/s   %ifutil
+10:00:01           lo      1.00      1.00      0.10      0.10      0.00      0.00      0.00      0.00
+10:00:01         eth0      5.00      4.00      0.50      0.40      0.00      0.00      0.00      0.01
+10:00:02           lo      2.00      2.00      0.20      0.20      0.00      0.00      0.00      0.00
+10:00:02         eth0      6.00      5.00      0.60      0.50      0.00      0.00      0.00      0.01
+
+Average:          CPU      %usr     %nice      %sys   %iowait    %steal      %irq     %soft    %guest    %gnice     %idle
+Average:          all      4.50      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     94.50
+Average:            0      6.50      0.00      2.00      0.00      0.00      0.00      0.00      0.00      0.00     91.50
+Average:            1      3.50      0.00      1.00      0.00      0.00      0.00      0.00      0.00      0.00     95.50
+Average:            2      3.50      0.00      0.00      0.00      0.00      0.00      0.00      0.00      0.00     96.50
+"""
+
+
+@pytest.fixture
+def sar_data():
+    return SarData(SAR_STRING.split("\n"))
+
+
+def test_sar_data_average_rows(sar_data):
+    detail = sar_data.get_CPU_utilization()
+    average = sar_data.get_CPU_utilization("average")
+    assert (detail["timestamp"] != "Average:").all()
+    assert (average["timestamp"] == "Average:").all()
+    assert len(average) == 4
+    # the average filter is internal to SarData, nothing leaks into the frames
+    assert detail.attrs == {} and average.attrs == {}
+    assert sar_data.get_disk_usage(data_type="average").empty
+
+
+def test_sar_data_cpu_filtered_by_threads(sar_data):
+    util = sar_data.get_CPU_util_avg_by_threads([0, 1])
+    assert not isinstance(util["CPU"].dtype, pd.CategoricalDtype)
+    assert sorted(util["CPU"].unique()) == ["0", "1"]
+
+    plt.figure()
+    sar_data.plot_CPU_util_time(threads=[0, 1])
+    labels = [t.get_text() for t in plt.gca().get_legend().get_texts()]
+    plt.close()
+    assert sorted(labels) == ["0", "1"]
+
+
+def test_sar_data_dev_iface_filtered(sar_data):
+    disk = sar_data.get_disk_usage("sda")
+    assert not isinstance(disk["DEV"].dtype, pd.CategoricalDtype)
+    assert disk["DEV"].unique().tolist() == ["sda"]
+    net = sar_data.get_network_statistics()
+    net = net[net["IFACE"] == "eth0"]
+    assert not isinstance(net["IFACE"].dtype, pd.CategoricalDtype)
+    assert net["IFACE"].unique().tolist() == ["eth0"]
+    # the parsed tables themselves keep plain strings
+    assert all(
+        not isinstance(dtype, pd.CategoricalDtype)
+        for df in sar_data.sar_data
+        for dtype in df.dtypes
+    )
+
+    plt.figure()
+    sar_data.plot_disk_usage()
+    labels = [t.get_text() for t in plt.gca().get_legend().get_texts()]
+    plt.close()
+    assert sorted(labels) == ["sda", "sdb"]
+
+
 if __name__ == "__main__":  # pragma: no cover
     pytest.main([__file__])
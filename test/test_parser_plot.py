@@ -0,0 +1,68 @@
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+from pipa.parser import (
+    LTTB_MIN_RATIO,
+    WEBGL_MIN_POINTS,
+    lttb_downsample,
+    make_single_plot,
+    scatter_type,
+)
+
+
+# Test for lttb_downsample
+def test_lttb_downsample():
+    x = np.arange(10000, dtype="float64")
+    y = np.sin(x / 100)
+    xs, ys = lttb_downsample(x, y, 500)
+    assert len(xs) == len(ys) == 500
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+    assert np.all(np.diff(xs) > 0)
+    # every kept point comes from the original series
+    np.testing.assert_array_equal(ys, y[xs.astype(int)])
+
+
+def test_lttb_downsample_keeps_peaks():
+    x = np.arange(10000, dtype="float64")
+    y = np.zeros_like(x)
+    y[1234], y[7777] = 5.0, -3.0
+    xs, _ = lttb_downsample(x, y, 500)
+    assert 1234 in xs and 7777 in xs
+
+
+def test_lttb_downsample_min_ratio():
+    # just above the target, downsampling costs more than the points it saves
+    n_out = 100
+    x = np.arange(LTTB_MIN_RATIO * n_out - 1, dtype="float64")
+    xs, _ = lttb_downsample(x, x, n_out)
+    assert len(xs) == len(x)
+    x = np.arange(LTTB_MIN_RATIO * n_out, dtype="float64")
+    xs, _ = lttb_downsample(x, x, n_out)
+    assert len(xs) == n_out
+
+
+@pytest.mark.parametrize("n_out", [None, 10, 2000])
+def test_lttb_downsample_short_series(n_out):
+    x = np.arange(10, dtype="float64")
+    y = x * 2
+    xs, ys = lttb_downsample(x, y, n_out)
+    np.testing.assert_array_equal(xs, x)
+    np.testing.assert_array_equal(ys, y)
+
+
+# Test for scatter_type
+def test_scatter_type():
+    assert scatter_type(WEBGL_MIN_POINTS) is go.Scatter
+    assert scatter_type(WEBGL_MIN_POINTS + 1) is go.Scattergl
+
+
+# Test for make_single_plot
+def test_make_single_plot():
+    scatters = [go.Scatter(x=[0, 1], y=[i, i + 1], name=str(i)) for i in range(3)]
+    fig = make_single_plot(scatters, "title", "x", "y", show=False)
+    assert [t.name for t in fig.data] == ["0", "1", "2"]
+    assert fig.layout.title.text == "title"
+
+
+if __name__ == "__main__":  # pragma: no cover
+    pytest.main([__file__])